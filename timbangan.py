@@ -8,6 +8,20 @@ import random
 import json
 import os
 import threading
+import struct
+import math
+import queue
+import http.client
+import socket
+import io
+import signal
+import cProfile
+import pstats
+import tracemalloc
+import multiprocessing
+from collections import deque
+from urllib.parse import urlsplit
+from multiprocessing import shared_memory
 import tkinter as tk
 from tkinter import font as tkfont
 from datetime import datetime
@@ -76,11 +90,23 @@ else:
             self.mode = 0
             self._base_weight_kg = 2.0  # Berat dasar simulasi (kg)
             self._last_raw = int(2.0 * 1000000)  # Raw value awal
+            self._offset_raw = 0  # Drift offset internal ADC (hilang setelah kalibrasi)
         
         def open(self, bus, device):
             pass
         
         def readbytes(self, n):
+            return self._next_sample()
+        
+        def xfer2(self, data):
+            # Transfer full-duplex: 3 byte pertama adalah data konversi
+            result = self._next_sample() + [0x00] * max(0, len(data) - 3)
+            # SCLK ke-25 dan ke-26 memulai offset self-calibration on-chip
+            if len(data) * 8 >= 26:
+                self._offset_raw = 0
+            return result[:len(data)]
+        
+        def _next_sample(self):
             # Simulasi data timbangan yang lebih realistis
             # Berat stabil dengan variasi kecil (seperti timbangan nyata)
             # Tambahkan sedikit drift dan noise
@@ -95,6 +121,10 @@ else:
             # Tambahkan noise kecil pada raw value (±1000 units = ±1g)
             raw_value += random.randint(-1000, 1000)
             
+            # Drift offset ADC (misal karena suhu) sampai dikalibrasi ulang
+            self._offset_raw += random.randint(-5, 5)
+            raw_value += self._offset_raw
+            
             # Simpan untuk konsistensi
             self._last_raw = raw_value
             
@@ -124,9 +154,20 @@ SPI_MISO_PIN = 9
 SPI_BUS = 0      # SPI Bus 0 (default)
 SPI_DEVICE = 0   # SPI Device 0 (default)
 SPI_SPEED = 1000000  # 1 MHz (sesuai dengan ADS1232 spec)
+HIGH_SPEED_LOOP_DELAY = 1.0 / 80  # Jeda loop akuisisi saat 80 SPS (--80sps), agar setiap sampel terbaca
+
+
+# Offset self-calibration on-chip ADS1232: 24 SCLK data + 2 SCLK tambahan
+# SPI bekerja per byte, jadi dikirim dalam satu transfer 4 byte (32 SCLK)
+OFFSET_CAL_SCLK = 26
+OFFSET_CAL_BYTES = (OFFSET_CAL_SCLK + 7) // 8
+OFFSET_CAL_TIME = {False: 0.801, True: 0.101}  # Lama kalibrasi (detik) untuk 10 SPS / 80 SPS
+OFFSET_CAL_INTERVAL = 600.0  # Kalibrasi offset periodik setiap 10 menit
+OFFSET_CAL_RETRY = 5.0  # Jeda awal (detik) sebelum mencoba ulang kalibrasi yang gagal, berlipat hingga interval
 
 
 SCALE_FACTOR = 0.0000015  # Faktor skala untuk konversi ke kg
+SCALE_INTERVAL = 0.001  # Scale interval d (kg): berat dibulatkan ke kelipatan d, misal 0.002 / 0.005 / 0.01
 OFFSET = 0.0  # Offset untuk zero adjustment
 
 # File untuk menyimpan data
@@ -135,6 +176,66 @@ DATA_DIR = "/home/project/datatimbangan"
 DATA_FILE = os.path.join(DATA_DIR, "data_timbangan.txt")
 CALIBRATION_FILE = os.path.join(DATA_DIR, "kalibrasi.json")  # File untuk menyimpan/memuat kalibrasi
 
+# Shared memory "pembacaan terakhir" untuk proses lokal lain (printer label, PLC bridge)
+SHM_NAME = "timbangan_reading"
+SHM_SEQ = struct.Struct("<Q")  # Versi seqlock: ganjil = sedang ditulis
+SHM_OWNER = struct.Struct("<q")  # PID proses writer pemilik segment
+SHM_PAYLOAD = struct.Struct("<dBdddB")  # weight, is_stable, stable_weight, stable_time, sample_time, stable_flags
+SHM_PAYLOAD_OFFSET = SHM_SEQ.size + SHM_OWNER.size
+SHM_SIZE = SHM_PAYLOAD_OFFSET + SHM_PAYLOAD.size
+
+# Uplink store-and-forward ke collector (aktif dengan --uplink URL)
+UPLINK_OUTBOX_FILE = os.path.join(DATA_DIR, "outbox.jsonl")  # Antrian data yang belum terkirim
+UPLINK_BATCH_SIZE = 100  # Maksimal record per request
+UPLINK_MAX_OUTBOX = 50000  # Batas record di outbox, data tertua dibuang jika penuh
+UPLINK_TRIM_RATIO = 0.9  # Saat outbox penuh, pangkas ke 90% kapasitas (rewrite file tidak terjadi per record)
+UPLINK_FLUSH_INTERVAL = 1.0  # Jeda maksimal (detik) sebelum batch dikirim
+UPLINK_TIMEOUT = 5.0  # Timeout koneksi HTTP (detik)
+UPLINK_MAX_BACKOFF = 60.0  # Jeda maksimal retry saat collector down (detik)
+
+# Idle policy: turunkan sampling / power down ADC saat timbangan kosong (aktif dengan --idle)
+IDLE_EMPTY_THRESHOLD = 0.02  # Berat di bawah ini (kg) dianggap platform kosong
+IDLE_LOW_RATE_AFTER = 60.0  # Kosong selama ini (detik) -> sampling lambat
+IDLE_POWER_DOWN_AFTER = 600.0  # Kosong selama ini (detik) -> ADC power down (None = tidak pernah)
+IDLE_LOW_RATE_INTERVAL = 0.5  # Jeda loop saat sampling lambat (detik)
+IDLE_WAKE_INTERVAL = 2.0  # Jeda wake-up saat power down (detik)
+
+# Profiling loop akuisisi (aktif dengan --profile)
+PROFILE_DIR = os.path.join(DATA_DIR, "profile")
+PROFILE_ACQUISITION_DIR = os.path.join(PROFILE_DIR, "acquisition")  # Capture child process (--process)
+PROFILE_INTERVAL = 300.0  # Capture otomatis setiap 5 menit (detik), atau kirim SIGUSR1
+PROFILE_DURATION = 10.0  # Lama satu capture cProfile (detik)
+PROFILE_KEEP = 20  # Jumlah capture yang disimpan, yang lama dihapus
+PROFILE_TOP_N = 25  # Jumlah fungsi / lokasi alokasi di ringkasan
+PROFILE_TRACEMALLOC_FRAMES = 5
+
+# Akuisisi di child process terpisah (aktif dengan --process)
+RING_CAPACITY = 1024  # Jumlah Reading di ring buffer (±12 detik pada 80 SPS)
+RING_HEADER = struct.Struct("<Q")  # Jumlah Reading yang pernah ditulis writer
+ACQUISITION_NICE = -10  # Prioritas proses akuisisi (butuh sudo), None = tidak diubah
+ACQUISITION_STOP_TIMEOUT = 3.0  # Tunggu child process berhenti (detik)
+
+# Timestamp: monotonic_ns per sampel, dipetakan ke wall-clock lewat offset berkala
+TIME_REFRESH_INTERVAL = 1.0  # Refresh offset monotonic -> wall-clock (detik)
+CLOCK_STEP_THRESHOLD = 0.1  # Perubahan offset lebih dari ini (detik) dianggap clock step (NTP / manual)
+
+# Trend chart di GUI
+TREND_WIDTH = 560  # Lebar chart (pixel), satu kolom pixel = min/max sampel dalam rentang waktunya
+TREND_HEIGHT = 140  # Tinggi chart (pixel)
+TREND_WINDOW = 30.0  # Rentang waktu yang ditampilkan (detik)
+TREND_MIN_SPAN = 0.05  # Rentang sumbu Y minimal (kg)
+TREND_FIT_INTERVAL = 5.0  # Cek penyempitan skala Y (detik)
+TREND_PENDING_MAX = 4096  # Batas sampel yang menunggu digambar
+TREND_MAX_GAP = 1.0  # Jeda data (detik) di atas ini tidak disambung garis (misal ADC power down saat idle)
+
+# Checkweigher: klasifikasi paket terhadap tabel SKU (aktif dengan --checkweigher)
+SKU_FILE = os.path.join(DATA_DIR, "sku.json")  # List {"sku", "target_kg", "under_kg", "over_kg", "tare_kg"}
+CHECKWEIGH_MIN_LOAD = 0.02  # Berat stabil di bawah ini (kg) dianggap platform kosong, tidak diklasifikasi
+
+# Control interface UDP lokal (aktif dengan --control-port N)
+CONTROL_HOST = "127.0.0.1"
+CONTROL_MAX_COMMANDS = 16  # Maksimal perintah yang diproses per siklus
+
 # Debug log path
 DEBUG_LOG_DIR = os.path.join(os.path.dirname(__file__), ".cursor")
 DEBUG_LOG_FILE = os.path.join(DEBUG_LOG_DIR, "debug.log")
@@ -263,6 +364,13 @@ def save_calibration(tare_value, scale_factor, load_cell_type="Unknown", max_cap
         return False
 
 
+def scale_interval_decimals(scale_interval):
+    """Jumlah desimal tampilan untuk scale interval d, misal 0.005 -> 3, 0.01 -> 2"""
+    if scale_interval <= 0:
+        raise ValueError(f"Scale interval harus positif: {scale_interval}")
+    return max(0, -math.floor(math.log10(scale_interval) + 1e-9))
+
+
 def verify_pin_safety():
     """
     Verifikasi keamanan konfigurasi pin
@@ -316,7 +424,8 @@ def verify_pin_safety():
 class ADS1232:
     """Kelas untuk mengontrol ADS1232"""
     
-    def __init__(self, pdwn_pin=PDWN_PIN, speed_pin=SPEED_PIN, force_calibration=False):
+    def __init__(self, pdwn_pin=PDWN_PIN, speed_pin=SPEED_PIN, force_calibration=False, high_speed=False,
+                 scale_interval=SCALE_INTERVAL):
         # CATATAN: ADS1232 18 pin TIDAK memiliki pin DRDY terpisah
         #          Data ready dideteksi melalui DOUT (SPI_MISO_PIN)
         self.pdwn_pin = pdwn_pin
@@ -329,13 +438,15 @@ class ADS1232:
         # Setup DOUT sebagai input untuk data ready detection
         GPIO.setup(self.dout_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         
+        self.powered = True
         if self.pdwn_pin:
             GPIO.setup(self.pdwn_pin, GPIO.OUT)
             GPIO.output(self.pdwn_pin, GPIO.HIGH)  # Power on
         
+        self.high_speed = high_speed
         if self.speed_pin:
             GPIO.setup(self.speed_pin, GPIO.OUT)
-            GPIO.output(self.speed_pin, GPIO.LOW)  # 10 SPS (atau HIGH untuk 80 SPS)
+            GPIO.output(self.speed_pin, GPIO.HIGH if high_speed else GPIO.LOW)  # LOW = 10 SPS, HIGH = 80 SPS
         
         # Setup SPI
         self.spi = spidev.SpiDev()
@@ -343,9 +454,16 @@ class ADS1232:
         self.spi.max_speed_hz = SPI_SPEED
         self.spi.mode = 0b01  # Mode 1: CPOL=0, CPHA=1
         
+        # Offset self-calibration on-chip saat startup (sebelum tare)
+        self.last_offset_cal = None
+        self.offset_cal_count = 0
+        self.offset_calibrate()
+        
         # Load atau lakukan kalibrasi
+        # tare_value disimpan sebagai integer count agar pipeline tetap integer sampai output
         self.tare_value = 0
         self.scale_factor = SCALE_FACTOR  # Default scale factor
+        self.scale_interval = scale_interval  # Scale interval d (kg), format tampilan di TimbanganApp
         
         if force_calibration:
             print("🔄 Memaksa kalibrasi baru...")
@@ -355,7 +473,7 @@ class ADS1232:
             # Coba muat kalibrasi yang sudah ada
             loaded_tare, loaded_scale = load_calibration()
             if loaded_tare is not None and loaded_scale is not None:
-                self.tare_value = loaded_tare
+                self.tare_value = int(round(loaded_tare))
                 self.scale_factor = loaded_scale
                 print("OK: Menggunakan kalibrasi yang sudah ada")
                 # Lakukan tare ulang untuk zero point yang lebih akurat
@@ -382,11 +500,8 @@ class ADS1232:
         Untuk ADS1232 18 pin: DOUT digunakan untuk mendeteksi data ready
         """
         # Tunggu sampai DOUT LOW (data ready) - sesuai ads1232_handler.py
-        timeout = time.time() + 1.0  # Timeout 1 detik
-        while GPIO.input(self.dout_pin) == GPIO.HIGH:
-            if time.time() > timeout:
-                return None
-            time.sleep(0.001)
+        if not self.wait_ready(1.0):  # Timeout 1 detik
+            return None
         
         # Baca 3 byte data (24-bit)
         data = self.spi.readbytes(3)
@@ -394,7 +509,20 @@ class ADS1232:
         if len(data) != 3:
             return None
         
-        # Konversi 24-bit signed integer
+        return self._decode_raw(data)
+    
+    def wait_ready(self, timeout_s):
+        """Tunggu sampai DOUT LOW (data ready), return False jika timeout"""
+        timeout = time.time() + timeout_s
+        while GPIO.input(self.dout_pin) == GPIO.HIGH:
+            if time.time() > timeout:
+                return False
+            time.sleep(0.001)
+        return True
+    
+    @staticmethod
+    def _decode_raw(data):
+        """Konversi 3 byte pertama menjadi 24-bit signed integer"""
         value = (data[0] << 16) | (data[1] << 8) | data[2]
         
         # Convert to signed 24-bit
@@ -403,6 +531,65 @@ class ADS1232:
         
         return value
     
+    def offset_calibrate(self):
+        """
+        Jalankan offset self-calibration on-chip ADS1232
+        Data 24 bit dibaca lalu diikuti 2 SCLK tambahan dalam satu transfer SPI,
+        kemudian tunggu DOUT LOW lagi (kalibrasi selesai)
+        Returns: True jika kalibrasi selesai
+        """
+        if not self.wait_ready(1.0):
+            print("WARNING: Offset calibration gagal - ADC tidak ready")
+            return False
+        
+        # SCLK ke-25 memaksa DOUT HIGH, SCLK ke-26 memulai kalibrasi
+        data = self.spi.xfer2([0x00] * OFFSET_CAL_BYTES)
+        if len(data) != OFFSET_CAL_BYTES:
+            return False
+        
+        # Tunggu kalibrasi selesai (DOUT kembali LOW), beri margin 2x
+        if not self.wait_ready(OFFSET_CAL_TIME[self.high_speed] * 2):
+            print("WARNING: Offset calibration timeout")
+            return False
+        
+        self.last_offset_cal = time.monotonic()
+        self.offset_cal_count += 1
+        return True
+    
+    def set_speed(self, high_speed):
+        """
+        Ganti data rate (False = 10 SPS, True = 80 SPS)
+        Offset calibration dijalankan ulang setelah perubahan speed
+        """
+        if high_speed == self.high_speed:
+            return True
+        self.high_speed = high_speed
+        if self.speed_pin:
+            GPIO.output(self.speed_pin, GPIO.HIGH if high_speed else GPIO.LOW)
+        return self.offset_calibrate()
+    
+    def power_down(self):
+        """Matikan ADC lewat PDWN LOW (hemat daya saat idle)"""
+        if self.pdwn_pin and self.powered:
+            GPIO.output(self.pdwn_pin, GPIO.LOW)
+            self.powered = False
+    
+    def power_up(self):
+        """
+        Nyalakan ADC lewat PDWN HIGH dan tunggu konversi pertama
+        ADS1232 otomatis menjalankan offset calibration setelah keluar dari power down
+        """
+        if self.powered:
+            return True
+        GPIO.output(self.pdwn_pin, GPIO.HIGH)
+        self.powered = True
+        if not self.wait_ready(OFFSET_CAL_TIME[self.high_speed] * 2):
+            print("WARNING: ADC tidak ready setelah power up")
+            return False
+        self.last_offset_cal = time.monotonic()
+        self.offset_cal_count += 1
+        return True
+    
     def tare(self, samples=10):
         """Kalibrasi zero point (tare)"""
         print("Melakukan kalibrasi zero point...")
@@ -414,8 +601,8 @@ class ADS1232:
             time.sleep(0.1)
         
         if values:
-            self.tare_value = sum(values) / len(values)
-            print(f"Zero point: {self.tare_value:.2f}")
+            self.tare_value = int(round(sum(values) / len(values)))
+            print(f"Zero point: {self.tare_value}")
         else:
             print("Gagal melakukan kalibrasi zero point")
     
@@ -475,19 +662,25 @@ class ADS1232:
             print("WARNING: Gagal membaca data untuk kalibrasi")
             return False
     
-    def read_weight(self):
-        """Baca berat dalam kg"""
+    def read_counts(self):
+        """Baca berat dalam count ADC (raw - tare), tetap integer"""
         raw = self.read_raw()
         if raw is None:
             return None
         
         # Kurangi dengan tare value
-        adjusted = raw - self.tare_value
-        
-        # Konversi ke kg menggunakan scale factor dari kalibrasi
-        weight_kg = adjusted * self.scale_factor
-        
-        return weight_kg
+        return raw - self.tare_value
+    
+    def read_weight(self):
+        """Baca berat dalam kg (dibulatkan ke scale interval d)"""
+        counts = self.read_counts()
+        if counts is None:
+            return None
+        return self.counts_to_kg(counts)
+    
+    def counts_to_kg(self, counts):
+        """Konversi count ke kg di output, dibulatkan ke kelipatan scale interval d"""
+        return math.floor(counts * self.scale_factor / self.scale_interval + 0.5) * self.scale_interval
     
     def cleanup(self):
         """Bersihkan resources"""
@@ -495,34 +688,464 @@ class ADS1232:
         GPIO.cleanup()
 
 
+class OffsetCalibrationScheduler:
+    """Penjadwal offset self-calibration on-chip ADS1232 (on-demand dan periodik)"""
+    
+    def __init__(self, ads, interval_s=OFFSET_CAL_INTERVAL):
+        """
+        ads: instance ADS1232
+        interval_s: jeda antar kalibrasi periodik (detik), None = nonaktif
+        """
+        self.ads = ads
+        self.interval_s = interval_s
+        self.pending = False
+        self.retry_at = None  # Waktu monotonic percobaan berikutnya setelah kalibrasi gagal
+        self.retry_delay = OFFSET_CAL_RETRY
+    
+    def request(self):
+        """Minta kalibrasi dijalankan pada siklus pembacaan berikutnya"""
+        self.pending = True
+    
+    def is_due(self):
+        """Cek apakah kalibrasi perlu dijalankan sekarang"""
+        if not self.ads.powered:
+            return False
+        if self.pending:
+            return True
+        if self.interval_s is None:
+            return False
+        now = time.monotonic()
+        if self.retry_at is not None:
+            return now >= self.retry_at
+        last = self.ads.last_offset_cal
+        return last is None or now - last >= self.interval_s
+    
+    def tick(self):
+        """Dipanggil sekali per siklus pembacaan; return True jika kalibrasi dijalankan"""
+        if not self.is_due():
+            return False
+        self.pending = False
+        if self.ads.offset_calibrate():
+            self.retry_at = None
+            self.retry_delay = OFFSET_CAL_RETRY
+            return True
+        # Gagal: coba lagi dengan backoff, jangan blocking di setiap siklus
+        self.retry_at = time.monotonic() + self.retry_delay
+        if self.interval_s is not None:
+            self.retry_delay = min(self.retry_delay * 2, self.interval_s)
+        return False
+
+
+class IdlePolicy:
+    """
+    Kebijakan idle untuk timbangan baterai:
+    ACTIVE (sampling penuh) -> LOW_RATE (sampling lambat) -> POWER_DOWN (ADC mati, wake-up berkala)
+    Kembali ke ACTIVE pada pembacaan pertama yang menunjukkan ada beban
+    """
+    
+    ACTIVE = 'ACTIVE'
+    LOW_RATE = 'LOW_RATE'
+    POWER_DOWN = 'POWER_DOWN'
+    
+    def __init__(self, ads, empty_threshold_kg=IDLE_EMPTY_THRESHOLD,
+                 low_rate_after_s=IDLE_LOW_RATE_AFTER, power_down_after_s=IDLE_POWER_DOWN_AFTER,
+                 low_rate_interval_s=IDLE_LOW_RATE_INTERVAL, wake_interval_s=IDLE_WAKE_INTERVAL):
+        self.ads = ads
+        self.empty_threshold_kg = empty_threshold_kg
+        self.low_rate_after_s = low_rate_after_s
+        self.power_down_after_s = power_down_after_s
+        self.low_rate_interval_s = low_rate_interval_s
+        self.wake_interval_s = wake_interval_s
+        self.active_high_speed = ads.high_speed  # Speed yang dipulihkan saat ada beban
+        self.state = self.ACTIVE
+        self.empty_since = None
+    
+    def before_read(self):
+        """Wake-up ADC sebelum membaca jika sedang power down"""
+        if self.state == self.POWER_DOWN:
+            self.ads.power_up()
+    
+    def after_read(self, weight):
+        """Update state berdasarkan pembacaan terakhir"""
+        now = time.monotonic()
+        
+        if weight is not None and abs(weight) >= self.empty_threshold_kg:
+            # Ada beban: langsung kembali ke sampling penuh
+            self.empty_since = None
+            if self.state != self.ACTIVE:
+                self._enter(self.ACTIVE)
+            return
+        
+        if weight is not None and self.empty_since is None:
+            self.empty_since = now
+        idle_s = 0.0 if self.empty_since is None else now - self.empty_since
+        
+        if self.power_down_after_s is not None and idle_s >= self.power_down_after_s:
+            if self.state != self.POWER_DOWN:
+                self._enter(self.POWER_DOWN)
+            else:
+                # Selesai wake-up, tidur lagi sampai wake-up berikutnya
+                self.ads.power_down()
+        elif self.state == self.ACTIVE and idle_s >= self.low_rate_after_s:
+            self._enter(self.LOW_RATE)
+    
+    def loop_delay(self, active_delay):
+        """Jeda loop sesuai state (detik)"""
+        if self.state == self.LOW_RATE:
+            return max(active_delay, self.low_rate_interval_s)
+        if self.state == self.POWER_DOWN:
+            return max(active_delay, self.wake_interval_s)
+        return active_delay
+    
+    def _enter(self, state):
+        if state == self.ACTIVE:
+            self.ads.power_up()
+            self.ads.set_speed(self.active_high_speed)
+        elif state == self.LOW_RATE:
+            self.ads.set_speed(False)
+        elif state == self.POWER_DOWN:
+            self.ads.set_speed(False)
+            self.ads.power_down()
+        self.state = state
+
+
+class Timestamper:
+    """
+    Layanan timestamp: Reading menyimpan monotonic_ns, dipetakan ke wall-clock lewat
+    offset yang di-refresh berkala. String waktu diformat lazy dan di-cache per milidetik
+    """
+    
+    def __init__(self, refresh_interval_s=TIME_REFRESH_INTERVAL, step_threshold_s=CLOCK_STEP_THRESHOLD):
+        self.refresh_interval_ns = int(refresh_interval_s * 1e9)
+        self.step_threshold_ns = int(step_threshold_s * 1e9)
+        self.last_refresh_ns = time.monotonic_ns()
+        self.offset_ns = time.time_ns() - self.last_refresh_ns
+        self.step_count = 0
+        self.last_step_ns = 0
+        self._cached_ms = None
+        self._cached_text = None
+        self._cached_sec = None
+        self._cached_sec_text = None
+    
+    def check_clock(self, t_ns):
+        """
+        Refresh offset jika interval sudah lewat
+        Returns: True jika clock step terdeteksi
+        """
+        if t_ns - self.last_refresh_ns < self.refresh_interval_ns:
+            return False
+        mono_ns = time.monotonic_ns()
+        offset_ns = time.time_ns() - mono_ns
+        step_ns = offset_ns - self.offset_ns
+        self.last_refresh_ns = mono_ns
+        self.offset_ns = offset_ns
+        if abs(step_ns) > self.step_threshold_ns:
+            self.step_count += 1
+            self.last_step_ns = step_ns
+            return True
+        return False
+    
+    def wall_time(self, t_ns):
+        """Waktu wall-clock (detik epoch) untuk monotonic_ns"""
+        return (t_ns + self.offset_ns) / 1e9
+    
+    def format(self, t_ns):
+        """Format 'YYYY-mm-dd HH:MM:SS.mmm'; strftime hanya sekali per detik"""
+        wall_ms = (t_ns + self.offset_ns) // 1000000
+        if wall_ms != self._cached_ms:
+            sec, ms = divmod(wall_ms, 1000)
+            if sec != self._cached_sec:
+                self._cached_sec = sec
+                self._cached_sec_text = datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+            self._cached_ms = wall_ms
+            self._cached_text = f"{self._cached_sec_text}.{ms:03d}"
+        return self._cached_text
+
+
+# Flag pada Reading
+READING_STABLE = 0x01  # Stabilizer mendeteksi berat stabil baru
+READING_SAVED = 0x02  # Tersimpan ke file
+READING_CLOCK_STEP = 0x04  # Waktu sistem melompat sejak data tersimpan sebelumnya
+READING_ACCEPT = 0x08  # Checkweigher: dalam toleransi
+READING_UNDER = 0x10  # Checkweigher: kurang dari target - toleransi bawah
+READING_OVER = 0x20  # Checkweigher: lebih dari target + toleransi atas
+READING_DECISION_MASK = READING_ACCEPT | READING_UNDER | READING_OVER
+READING_AVERAGE = 0x40  # Rata-rata buffer stabil (untuk disimpan), bukan sampel ADC
+READING_STRUCT = struct.Struct("<qidB")  # t_ns, counts, weight, flags (21 byte per sampel)
+
+
+class Reading:
+    """
+    Satu sampel timbangan, dibuat sekali per pembacaan lalu diteruskan by reference
+    ke stabilizer, penyimpanan dan tampilan
+    """
+    
+    __slots__ = ('counts', 't_ns', 'weight', 'flags', 'timestamp')
+    
+    def __init__(self, counts, t_ns, weight=0.0, flags=0):
+        self.counts = counts  # Count ADC (raw - tare), integer
+        self.t_ns = t_ns  # time.monotonic_ns() saat sampel dibaca
+        self.weight = weight  # Berat (kg) dibulatkan ke scale interval d
+        self.flags = flags
+        self.timestamp = None  # String waktu, hanya diisi saat disimpan
+    
+    @property
+    def is_stable(self):
+        return bool(self.flags & READING_STABLE)
+    
+    def pack(self):
+        """Encode ke format biner READING_STRUCT"""
+        return READING_STRUCT.pack(self.t_ns, self.counts, self.weight, self.flags)
+    
+    @classmethod
+    def unpack(cls, data, offset=0):
+        """Decode satu Reading dari buffer biner"""
+        t_ns, counts, weight, flags = READING_STRUCT.unpack_from(data, offset)
+        return cls(counts, t_ns, weight, flags)
+    
+    def __repr__(self):
+        return f"Reading(counts={self.counts}, t_ns={self.t_ns}, weight={self.weight}, flags={self.flags:#x})"
+
+
+def pack_readings(readings):
+    """Encode banyak Reading sekaligus (bulk I/O)"""
+    buf = bytearray(READING_STRUCT.size * len(readings))
+    for i, reading in enumerate(readings):
+        READING_STRUCT.pack_into(buf, i * READING_STRUCT.size,
+                                 reading.t_ns, reading.counts, reading.weight, reading.flags)
+    return bytes(buf)
+
+
+def unpack_readings(data):
+    """Decode hasil pack_readings kembali menjadi list Reading"""
+    return [Reading(counts, t_ns, weight, flags)
+            for t_ns, counts, weight, flags in READING_STRUCT.iter_unpack(data)]
+
+
+def decision_name(flags):
+    """Nama keputusan checkweigher dari flag Reading, None jika tidak diklasifikasi"""
+    if flags & READING_ACCEPT:
+        return "ACCEPT"
+    if flags & READING_UNDER:
+        return "UNDER"
+    if flags & READING_OVER:
+        return "OVER"
+    return None
+
+
+class SkuStats:
+    """Statistik berjalan per SKU (Welford untuk rata-rata dan standar deviasi berat bersih)"""
+    
+    __slots__ = ('count', 'accepted', 'under', 'over', 'mean', 'm2', 'min', 'max')
+    
+    def __init__(self):
+        self.count = 0
+        self.accepted = 0
+        self.under = 0
+        self.over = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+    
+    def add(self, net_kg, decision):
+        self.count += 1
+        if decision == READING_ACCEPT:
+            self.accepted += 1
+        elif decision == READING_UNDER:
+            self.under += 1
+        else:
+            self.over += 1
+        delta = net_kg - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (net_kg - self.mean)
+        self.min = net_kg if self.min is None else min(self.min, net_kg)
+        self.max = net_kg if self.max is None else max(self.max, net_kg)
+    
+    @property
+    def stdev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class Sku:
+    """Satu baris tabel SKU; batas toleransi disimpan sebagai berat kotor dalam satuan d"""
+    
+    __slots__ = ('code', 'target_kg', 'under_kg', 'over_kg', 'tare_kg', 'lower_d', 'upper_d', 'stats')
+    
+    def __init__(self, code, target_kg, under_kg, over_kg, tare_kg=0.0):
+        if target_kg <= 0 or under_kg < 0 or over_kg < 0:
+            raise ValueError(f"SKU {code}: target harus positif dan toleransi tidak negatif")
+        self.code = code
+        self.target_kg = target_kg
+        self.under_kg = under_kg
+        self.over_kg = over_kg
+        self.tare_kg = tare_kg
+        self.lower_d = None
+        self.upper_d = None
+        self.stats = SkuStats()
+    
+    def set_scale_interval(self, scale_interval):
+        """Konversi batas ke integer kelipatan d (sekali saat load)"""
+        # Margin kecil agar batas yang tepat kelipatan d tidak bergeser karena error float
+        self.lower_d = math.ceil((self.target_kg + self.tare_kg - self.under_kg) / scale_interval - 1e-6)
+        self.upper_d = math.floor((self.target_kg + self.tare_kg + self.over_kg) / scale_interval + 1e-6)
+
+
+class Checkweigher:
+    """
+    Klasifikasi setiap berat stabil terhadap SKU aktif (ACCEPT / UNDER / OVER)
+    Tabel SKU di-index dalam dict, perbandingan dilakukan dalam integer satuan d
+    """
+    
+    def __init__(self, skus, scale_interval=SCALE_INTERVAL, min_load_kg=CHECKWEIGH_MIN_LOAD):
+        self.scale_interval = scale_interval
+        self.min_load_kg = min_load_kg
+        self.min_load_d = int(round(min_load_kg / scale_interval))
+        self.skus = {}
+        for sku in skus:
+            sku.set_scale_interval(scale_interval)
+            self.skus[sku.code] = sku
+        self.active = None
+    
+    @classmethod
+    def load(cls, path=SKU_FILE, scale_interval=SCALE_INTERVAL):
+        """Muat tabel SKU dari file JSON"""
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        skus = [Sku(str(row['sku']), float(row['target_kg']), float(row['under_kg']),
+                    float(row['over_kg']), float(row.get('tare_kg', 0.0)))
+                for row in rows]
+        print(f"OK: {len(skus)} SKU dimuat dari {path}")
+        return cls(skus, scale_interval)
+    
+    def select(self, code):
+        """Pilih SKU aktif; return False jika SKU tidak ada"""
+        sku = self.skus.get(code)
+        if sku is None:
+            return False
+        self.active = sku
+        return True
+    
+    def classify(self, reading):
+        """
+        Klasifikasi Reading stabil dan set flag keputusan
+        Returns: flag keputusan, atau None jika tidak ada SKU aktif / platform kosong
+        """
+        sku = self.active
+        if sku is None:
+            return None
+        gross_d = int(round(reading.weight / self.scale_interval))
+        if gross_d < self.min_load_d:
+            return None
+        if gross_d < sku.lower_d:
+            decision = READING_UNDER
+        elif gross_d > sku.upper_d:
+            decision = READING_OVER
+        else:
+            decision = READING_ACCEPT
+        reading.flags |= decision
+        sku.stats.add(reading.weight - sku.tare_kg, decision)
+        return decision
+    
+    def stats_lines(self):
+        """Ringkasan statistik per SKU untuk ditampilkan"""
+        lines = []
+        for sku in self.skus.values():
+            stats = sku.stats
+            if stats.count == 0:
+                continue
+            lines.append(f"{sku.code}: {stats.count} item, ACCEPT {stats.accepted}, UNDER {stats.under}, "
+                         f"OVER {stats.over}, rata-rata {stats.mean:.4f} kg, stdev {stats.stdev:.4f} kg, "
+                         f"min {stats.min:.4f} kg, max {stats.max:.4f} kg")
+        return lines
+
+
+class ControlServer:
+    """
+    Control interface UDP lokal, satu perintah teks per datagram:
+    tare, offset_cal, sku <kode>, sku, stats, subscribe, unsubscribe
+    Subscriber menerima keputusan checkweigher pada siklus yang sama dengan penimbangan
+    """
+    
+    def __init__(self, port, host=CONTROL_HOST):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.subscribers = set()
+    
+    def poll(self):
+        """Ambil perintah yang masuk tanpa blocking; return list (text, addr)"""
+        commands = []
+        for _ in range(CONTROL_MAX_COMMANDS):
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break  # Misal ICMP port unreachable dari subscriber yang sudah tutup (Windows)
+            commands.append((data.decode('utf-8', errors='replace').strip(), addr))
+        return commands
+    
+    def reply(self, addr, text):
+        try:
+            self.sock.sendto(text.encode('utf-8'), addr)
+        except OSError:
+            pass
+    
+    def notify(self, text):
+        """Kirim ke semua subscriber"""
+        for addr in list(self.subscribers):
+            self.reply(addr, text)
+    
+    def close(self):
+        self.sock.close()
+
+
 class WeightStabilizer:
     """Kelas untuk mendeteksi stabilitas berat"""
     
-    def __init__(self, threshold_kg=0.005, stable_count=5):
+    def __init__(self, threshold_kg=0.005, stable_count=5, scale_factor=SCALE_FACTOR, rearm_kg=None):
         """
         threshold_kg: perbedaan maksimal (kg) untuk dianggap stabil
         stable_count: jumlah pembacaan berturut-turut yang harus stabil
+        scale_factor: kg per count, untuk konversi threshold ke count
+        rearm_kg: sampel di bawah berat ini (platform kosong) me-reset berat stabil terakhir,
+                  sehingga item berikutnya dengan berat sama tetap terdeteksi (checkweigher); None = nonaktif
         """
         self.threshold_kg = threshold_kg
         self.stable_count = stable_count
-        self.weight_buffer = []
-        self.last_stable_weight = None
+        self.rearm_kg = rearm_kg
+        self.weight_buffer = []  # Berisi count ADC (integer, sudah dikurangi tare)
+        self.last_stable_total = None  # Jumlah count buffer saat stabil terakhir
         self.stable_counter = 0
+        self.set_scale_factor(scale_factor)
+    
+    def set_scale_factor(self, scale_factor):
+        """Konversi threshold ke count (sekali per kalibrasi)"""
+        self.scale_factor = scale_factor
+        self.threshold_counts = abs(int(round(self.threshold_kg / scale_factor)))
+        self.rearm_counts = None if self.rearm_kg is None else int(round(self.rearm_kg / scale_factor))
     
-    def add_reading(self, weight):
-        """Tambahkan pembacaan berat baru"""
+    def add_reading(self, reading):
+        """Tambahkan Reading baru; set flag READING_STABLE jika berat stabil baru terdeteksi"""
         # #region agent log
         try:
             ensure_debug_log_directory()
-            import json;f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:515','message':'WeightStabilizer add_reading','data':{'weight':weight,'buffer_len':len(self.weight_buffer),'stable_counter':self.stable_counter},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H2'})+'\n');f.close()
+            import json;f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:515','message':'WeightStabilizer add_reading','data':{'counts':None if reading is None else reading.counts,'buffer_len':len(self.weight_buffer),'stable_counter':self.stable_counter},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H2'})+'\n');f.close()
         except: pass
         # #endregion
         
-        if weight is None:
+        if reading is None:
             return False
         
+        # Platform kosong setelah item stabil: item berikutnya selalu dianggap stabil baru
+        if (self.rearm_counts is not None and reading.counts < self.rearm_counts
+                and self.last_stable_total is not None
+                and self.last_stable_total >= self.rearm_counts * self.stable_count):
+            self.last_stable_total = None
+        
         # Tambahkan ke buffer
-        self.weight_buffer.append(weight)
+        self.weight_buffer.append(reading.counts)
         
         # Batasi buffer size
         if len(self.weight_buffer) > self.stable_count:
@@ -532,29 +1155,32 @@ class WeightStabilizer:
         if len(self.weight_buffer) < self.stable_count:
             return False
         
-        # Cek stabilitas: hitung standar deviasi
-        avg_weight = sum(self.weight_buffer) / len(self.weight_buffer)
-        max_diff = max(abs(w - avg_weight) for w in self.weight_buffer)
+        # Cek stabilitas dalam integer: |w - total/n| <= threshold  <=>  |w*n - total| <= threshold*n
+        n = len(self.weight_buffer)
+        total = sum(self.weight_buffer)
+        max_diff = max(abs(w * n - total) for w in self.weight_buffer)
+        threshold = self.threshold_counts * n
         
         # #region agent log
         try:
-            f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:540','message':'Stability check','data':{'avg_weight':avg_weight,'max_diff':max_diff,'threshold':self.threshold_kg,'is_stable':max_diff <= self.threshold_kg},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H3'})+'\n');f.close()
+            f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:540','message':'Stability check','data':{'total_counts':total,'max_diff':max_diff,'threshold':threshold,'is_stable':max_diff <= threshold},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H3'})+'\n');f.close()
         except: pass
         # #endregion
         
         # Jika stabil
-        if max_diff <= self.threshold_kg:
+        if max_diff <= threshold:
             # Cek apakah berbeda dari nilai stabil terakhir
-            if self.last_stable_weight is None or abs(avg_weight - self.last_stable_weight) > self.threshold_kg:
-                self.last_stable_weight = avg_weight
+            if self.last_stable_total is None or abs(total - self.last_stable_total) > threshold:
+                self.last_stable_total = total
                 self.stable_counter = 0
                 
                 # #region agent log
                 try:
-                    f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:554','message':'New stable weight detected','data':{'stable_weight':avg_weight},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H2'})+'\n');f.close()
+                    f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:554','message':'New stable weight detected','data':{'stable_total_counts':total},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H2'})+'\n');f.close()
                 except: pass
                 # #endregion
                 
+                reading.flags |= READING_STABLE
                 return True
         else:
             # Reset jika tidak stabil
@@ -563,9 +1189,10 @@ class WeightStabilizer:
         return False
     
     def get_stable_weight(self):
-        """Ambil berat stabil terakhir"""
-        if self.last_stable_weight is not None and len(self.weight_buffer) >= self.stable_count:
-            return sum(self.weight_buffer) / len(self.weight_buffer)
+        """Ambil berat stabil terakhir (rata-rata count, dibulatkan integer)"""
+        if self.last_stable_total is not None and len(self.weight_buffer) >= self.stable_count:
+            n = len(self.weight_buffer)
+            return (2 * sum(self.weight_buffer) + n) // (2 * n)
         return None
     
     def reset(self):
@@ -574,10 +1201,622 @@ class WeightStabilizer:
         self.stable_counter = 0
 
 
+def pid_alive(pid):
+    """Cek apakah proses dengan PID tersebut masih berjalan"""
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # Di Windows segment hilang saat handle terakhir ditutup, jadi segment yang ada pasti masih dipakai
+        # (os.kill(pid, 0) di Windows justru menghentikan proses)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedReadingWriter:
+    """
+    Publikasi berat saat ini dan berat stabil terakhir ke shared memory
+    Menggunakan seqlock: counter ganjil selama penulisan, genap setelah selesai
+    Hanya satu writer per segment; PID pemilik disimpan di header
+    """
+    
+    def __init__(self, name=SHM_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+        except FileExistsError:
+            # Segment sudah ada: hanya boleh dipakai ulang jika pemiliknya sudah mati
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm.size < SHM_SIZE:
+                self.shm.close()
+                raise ValueError(f"Shared memory {name} terlalu kecil ({self.shm.size} byte)")
+            owner = SHM_OWNER.unpack_from(self.shm.buf, SHM_SEQ.size)[0]
+            if pid_alive(owner):
+                self.shm.close()
+                raise RuntimeError(f"Shared memory {name} sedang dipakai proses lain (PID {owner})")
+            print(f"WARNING: Memakai ulang shared memory {name} dari proses {owner} yang tidak keluar dengan bersih")
+        SHM_OWNER.pack_into(self.shm.buf, SHM_SEQ.size, os.getpid())
+        # Lanjutkan dari versi yang ada, dibulatkan ke genap
+        self.seq = (SHM_SEQ.unpack_from(self.shm.buf, 0)[0] + 1) & ~1
+    
+    def publish(self, reading, stable_reading=None, stable_time=None, sample_time=None):
+        """Tulis Reading terbaru dan Reading stabil terakhir (None disimpan sebagai NaN)"""
+        buf = self.shm.buf
+        SHM_SEQ.pack_into(buf, 0, self.seq + 1)
+        SHM_PAYLOAD.pack_into(
+            buf, SHM_PAYLOAD_OFFSET,
+            math.nan if reading is None else reading.weight,
+            1 if reading is not None and reading.is_stable else 0,
+            math.nan if stable_reading is None else stable_reading.weight,
+            math.nan if stable_time is None else stable_time,
+            time.time() if sample_time is None else sample_time,
+            0 if stable_reading is None else stable_reading.flags,
+        )
+        self.seq += 2
+        SHM_SEQ.pack_into(buf, 0, self.seq)
+    
+    def close(self):
+        """Tutup dan hapus segment shared memory (jika masih milik writer ini)"""
+        try:
+            owned = SHM_OWNER.unpack_from(self.shm.buf, SHM_SEQ.size)[0] == os.getpid()
+            self.shm.close()
+            if owned:
+                self.shm.unlink()
+            else:
+                # Segment sudah diambil alih proses lain, jangan sampai dihapus resource_tracker saat keluar
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        except FileNotFoundError:
+            pass
+
+
+class SharedReadingReader:
+    """Pembaca segment shared memory dari SharedReadingWriter (untuk proses lain)"""
+    
+    def __init__(self, name=SHM_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Jangan biarkan resource_tracker menghapus segment milik writer saat reader keluar
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+    
+    def read(self, retries=1000):
+        """
+        Baca snapshot yang konsisten
+        Returns: dict pembacaan, atau None jika belum ada data / writer terus menulis
+        """
+        buf = self.shm.buf
+        for _ in range(retries):
+            seq_before = SHM_SEQ.unpack_from(buf, 0)[0]
+            if seq_before & 1:
+                continue
+            payload = SHM_PAYLOAD.unpack_from(buf, SHM_PAYLOAD_OFFSET)
+            if SHM_SEQ.unpack_from(buf, 0)[0] != seq_before:
+                continue
+            if seq_before == 0:
+                return None
+            weight, is_stable, stable_weight, stable_time, sample_time, stable_flags = payload
+            return {
+                'seq': seq_before,
+                'weight': None if math.isnan(weight) else weight,
+                'is_stable': bool(is_stable),
+                'stable_weight': None if math.isnan(stable_weight) else stable_weight,
+                'stable_time': None if math.isnan(stable_time) else stable_time,
+                'sample_time': sample_time,
+                'decision': decision_name(stable_flags),
+            }
+        return None
+    
+    def close(self):
+        self.shm.close()
+
+
+class UplinkForwarder:
+    """
+    Store-and-forward data stabil ke collector via HTTP POST (JSON array)
+    Record masuk outbox di disk lalu dikirim per batch oleh thread terpisah
+    melalui satu koneksi keep-alive, sehingga loop akuisisi tidak menunggu jaringan
+    """
+    
+    def __init__(self, url, outbox_file=UPLINK_OUTBOX_FILE, batch_size=UPLINK_BATCH_SIZE,
+                 max_outbox=UPLINK_MAX_OUTBOX, flush_interval=UPLINK_FLUSH_INTERVAL,
+                 timeout=UPLINK_TIMEOUT):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise ValueError(f"URL uplink tidak valid: {url}")
+        self.host = parts.netloc
+        self.path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self.conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.conn = None
+        
+        self.outbox_file = outbox_file
+        self.batch_size = batch_size
+        self.max_outbox = max_outbox
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        
+        self.queue = queue.Queue()
+        self.ack_file = outbox_file + '.ack'  # Jumlah baris awal outbox yang sudah terkirim
+        self.file_acked = 0
+        self.lock = threading.Lock()  # Melindungi self.outbox dan file outbox (worker vs close)
+        self.outbox = self._load_outbox()
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.backoff = 0.0
+        self.next_retry = 0.0
+        
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+    
+    def enqueue(self, reading):
+        """Antrikan satu Reading stabil (non-blocking, aman dipanggil dari loop akuisisi)"""
+        record = {'timestamp': reading.timestamp, 'mono_ns': reading.t_ns, 'weight_kg': round(reading.weight, 6)}
+        if reading.flags & READING_CLOCK_STEP:
+            record['clock_step'] = True
+        if reading.flags & READING_DECISION_MASK:
+            record['decision'] = decision_name(reading.flags)
+        self.queue.put_nowait(record)
+    
+    def pending_count(self):
+        """Jumlah record yang belum terkirim"""
+        return len(self.outbox) + self.queue.qsize()
+    
+    def close(self):
+        """Hentikan thread; sisa data tetap tersimpan di outbox untuk dikirim saat start berikutnya"""
+        self.running = False
+        # Simpan antrian ke outbox dulu: worker bisa masih tertahan di _send lebih lama dari timeout join
+        records = []
+        try:
+            while True:
+                records.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if records:
+            self._append_outbox(records)
+        self.thread.join(timeout=self.timeout + 1.0)
+        self._close_connection()
+    
+    def _worker(self):
+        while self.running or not self.queue.empty():
+            records = []
+            try:
+                records.append(self.queue.get(timeout=self.flush_interval))
+                while True:
+                    records.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            
+            if records:
+                self._append_outbox(records)
+            
+            if self.outbox and time.monotonic() >= self.next_retry:
+                self._flush()
+    
+    def _flush(self):
+        """Kirim seluruh outbox per batch (replay bulk setelah reconnect)"""
+        while True:
+            with self.lock:
+                batch = self.outbox[:self.batch_size]
+            if not batch:
+                self.backoff = 0.0
+                break
+            if not self._send(batch):
+                # Collector down: exponential backoff
+                self.backoff = min(max(self.backoff * 2, 1.0), UPLINK_MAX_BACKOFF)
+                self.next_retry = time.monotonic() + self.backoff
+                break
+            
+            with self.lock:
+                # close() bisa memangkas record tertua selama _send: yang masih ada dari batch
+                # ini selalu berada di depan outbox, jadi hanya bagian itu yang dihapus
+                head = self.outbox[0] if self.outbox else None
+                dropped = next((i for i, record in enumerate(batch) if record is head), len(batch))
+                sent = len(batch) - dropped
+                del self.outbox[:sent]
+                self.sent_count += len(batch)
+                self.file_acked += sent
+                # Compact hanya jika outbox kosong atau lebih dari separuh file sudah terkirim,
+                # selain itu cukup catat jumlah baris terkirim (file outbox tidak ditulis ulang)
+                if self.file_acked >= len(self.outbox):
+                    self._rewrite_outbox()
+                else:
+                    self._write_ack()
+    
+    def _send(self, batch):
+        """POST satu batch; return True jika collector membalas 2xx"""
+        body = json.dumps(batch).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        for attempt in range(2):
+            try:
+                if self.conn is None:
+                    self.conn = self.conn_class(self.host, timeout=self.timeout)
+                self.conn.request('POST', self.path, body, headers)
+                response = self.conn.getresponse()
+                response.read()
+                if 200 <= response.status < 300:
+                    return True
+                self._close_connection()
+                return False
+            except (OSError, http.client.HTTPException):
+                # Koneksi keep-alive mungkin sudah ditutup server, coba sekali dengan koneksi baru
+                self._close_connection()
+        return False
+    
+    def _close_connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+    
+    def _load_outbox(self):
+        """Muat record yang belum terkirim dari run sebelumnya"""
+        records = []
+        try:
+            skip = 0
+            if os.path.exists(self.ack_file):
+                with open(self.ack_file, 'r', encoding='utf-8') as f:
+                    skip = int(f.read().strip() or 0)
+            self.file_acked = skip
+            if os.path.exists(self.outbox_file):
+                with open(self.outbox_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if skip:
+                            skip -= 1
+                            continue
+                        line = line.strip()
+                        if line:
+                            try:
+                                records.append(json.loads(line))
+                            except json.JSONDecodeError:
+                                pass  # Baris terpotong (misal listrik mati saat menulis)
+                if records:
+                    print(f"ℹ️  Uplink: {len(records)} data belum terkirim dimuat dari outbox")
+        except Exception as e:
+            print(f"WARNING: Gagal membaca outbox uplink: {e}")
+        if len(records) > self.max_outbox:
+            # Outbox lama melebihi kapasitas: pangkas dan tulis ulang agar baris file sesuai memori
+            records = records[-int(self.max_outbox * UPLINK_TRIM_RATIO):]
+            self.outbox = records
+            self._rewrite_outbox()
+        return records
+    
+    def _append_outbox(self, records):
+        with self.lock:
+            self.outbox.extend(records)
+            if len(self.outbox) > self.max_outbox:
+                # Buang data tertua sekaligus sampai 90% kapasitas agar rewrite jarang terjadi
+                excess = len(self.outbox) - int(self.max_outbox * UPLINK_TRIM_RATIO)
+                del self.outbox[:excess]
+                self.dropped_count += excess
+                print(f"\nWARNING: Outbox uplink penuh, {excess} data tertua dibuang")
+                self._rewrite_outbox()
+                return
+            try:
+                with open(self.outbox_file, 'a', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record) + '\n')
+            except Exception as e:
+                print(f"\nWARNING: Gagal menulis outbox uplink: {e}")
+    
+    def _write_ack(self):
+        """Catat jumlah baris awal file outbox yang sudah terkirim (file kecil, ditulis atomik)"""
+        try:
+            tmp_file = self.ack_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(str(self.file_acked))
+            os.replace(tmp_file, self.ack_file)
+        except Exception as e:
+            print(f"\nWARNING: Gagal menulis outbox uplink: {e}")
+    
+    def _rewrite_outbox(self):
+        """Tulis ulang file outbox berisi record yang belum terkirim saja"""
+        try:
+            # Hapus ack dulu: jika mati di tengah jalan, data terkirim ulang (duplikat), bukan hilang
+            if os.path.exists(self.ack_file):
+                os.remove(self.ack_file)
+            self.file_acked = 0
+            tmp_file = self.outbox_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for record in self.outbox:
+                    f.write(json.dumps(record) + '\n')
+            os.replace(tmp_file, self.outbox_file)
+        except Exception as e:
+            print(f"\nWARNING: Gagal menulis outbox uplink: {e}")
+
+
+class LoopProfiler:
+    """
+    Profiling loop akuisisi tanpa menghentikan timbangan
+    Setiap capture menjalankan cProfile selama PROFILE_DURATION detik di thread akuisisi,
+    lalu menulis file .prof dan ringkasan top-N fungsi + lokasi alokasi (tracemalloc)
+    """
+    
+    def __init__(self, output_dir=PROFILE_DIR, interval_s=PROFILE_INTERVAL,
+                 duration_s=PROFILE_DURATION, keep=PROFILE_KEEP, top_n=PROFILE_TOP_N):
+        self.output_dir = output_dir
+        self.interval_s = interval_s
+        self.duration_s = duration_s
+        self.keep = keep
+        self.top_n = top_n
+        self.profile = None
+        self.capture_end = None
+        self.next_capture = time.monotonic() + interval_s
+        self.requested = False
+        self.last_snapshot = None
+        self.capture_count = 0
+        
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        
+        # Capture on-demand: kill -USR1 <pid>
+        if hasattr(signal, 'SIGUSR1'):
+            try:
+                signal.signal(signal.SIGUSR1, self._on_signal)
+            except ValueError:
+                pass  # Bukan main thread
+    
+    def _on_signal(self, signum, frame):
+        self.requested = True
+    
+    def tick(self):
+        """Dipanggil sekali per siklus dari thread akuisisi"""
+        now = time.monotonic()
+        if self.profile is None:
+            if self.requested or now >= self.next_capture:
+                self.requested = False
+                self.profile = cProfile.Profile()
+                self.capture_end = now + self.duration_s
+                self.profile.enable()
+        elif now >= self.capture_end:
+            self.profile.disable()
+            self._write_capture(self.profile)
+            self.profile = None
+            self.next_capture = now + self.interval_s
+    
+    def stop(self):
+        """Selesaikan capture yang sedang berjalan"""
+        if self.profile is not None:
+            self.profile.disable()
+            self._write_capture(self.profile)
+            self.profile = None
+    
+    def _write_capture(self, profile):
+        try:
+            # Snapshot diambil dulu agar alokasi dari penulisan laporan tidak ikut terhitung
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            os.makedirs(self.output_dir, exist_ok=True)
+            name = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            profile.dump_stats(os.path.join(self.output_dir, f"profile_{name}.prof"))
+            
+            report = io.StringIO()
+            report.write(f"Capture: {name} ({self.duration_s:g} detik)\n\n")
+            report.write(f"=== Top {self.top_n} fungsi (tottime) ===\n")
+            pstats.Stats(profile, stream=report).sort_stats('tottime').print_stats(self.top_n)
+            
+            report.write(f"=== Top {self.top_n} lokasi alokasi ===\n")
+            for stat in snapshot.statistics('lineno')[:self.top_n]:
+                report.write(f"{stat}\n")
+            if self.last_snapshot is not None:
+                report.write(f"\n=== Top {self.top_n} perubahan alokasi sejak capture sebelumnya ===\n")
+                for stat in snapshot.compare_to(self.last_snapshot, 'lineno')[:self.top_n]:
+                    report.write(f"{stat}\n")
+            self.last_snapshot = snapshot
+            
+            with open(os.path.join(self.output_dir, f"summary_{name}.txt"), 'w', encoding='utf-8') as f:
+                f.write(report.getvalue())
+            self.capture_count += 1
+            self._rotate()
+        except Exception as e:
+            print(f"\nWARNING: Gagal menulis hasil profiling: {e}")
+    
+    def _rotate(self):
+        """Hapus capture lama, simpan hanya `keep` capture terbaru"""
+        for prefix in ("profile_", "summary_"):
+            files = sorted(f for f in os.listdir(self.output_dir) if f.startswith(prefix))
+            for old_file in files[:-self.keep]:
+                os.remove(os.path.join(self.output_dir, old_file))
+
+
+class ReadingRing:
+    """
+    Ring buffer Reading di shared memory untuk satu writer (proses akuisisi)
+    dan satu reader (proses GUI/penyimpanan)
+    """
+    
+    def __init__(self, name=None, capacity=RING_CAPACITY, create=False):
+        self.capacity = capacity
+        if create:
+            size = RING_HEADER.size + capacity * READING_STRUCT.size
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            RING_HEADER.pack_into(self.shm.buf, 0, 0)
+        else:
+            # Child process berbagi resource_tracker dengan parent, jadi tidak perlu unregister
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.owner = create
+        self.write_seq = 0
+        self.read_seq = 0
+        self.lost_count = 0
+    
+    def _offset(self, seq):
+        return RING_HEADER.size + (seq % self.capacity) * READING_STRUCT.size
+    
+    def push(self, reading):
+        """Tulis satu Reading (sisi writer); slot tertua ditimpa jika reader tertinggal"""
+        buf = self.shm.buf
+        READING_STRUCT.pack_into(buf, self._offset(self.write_seq),
+                                 reading.t_ns, reading.counts, reading.weight, reading.flags)
+        self.write_seq += 1
+        RING_HEADER.pack_into(buf, 0, self.write_seq)
+    
+    def pop_all(self):
+        """Ambil semua Reading baru (sisi reader)"""
+        buf = self.shm.buf
+        write_seq = RING_HEADER.unpack_from(buf, 0)[0]
+        if write_seq - self.read_seq > self.capacity:
+            self.lost_count += write_seq - self.capacity - self.read_seq
+            self.read_seq = write_seq - self.capacity
+        
+        start = self.read_seq
+        readings = []
+        for seq in range(start, write_seq):
+            t_ns, counts, weight, flags = READING_STRUCT.unpack_from(buf, self._offset(seq))
+            readings.append(Reading(counts, t_ns, weight, flags))
+        
+        # Buang slot yang mungkin sudah ditimpa writer selama dibaca
+        overwritten = RING_HEADER.unpack_from(buf, 0)[0] + 1 - self.capacity - start
+        if overwritten > 0:
+            del readings[:overwritten]
+            self.lost_count += overwritten
+        
+        self.read_seq = write_seq
+        return readings
+    
+    def close(self):
+        """Tutup segment; owner juga menghapusnya"""
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def set_acquisition_priority(cpu=None, nice=ACQUISITION_NICE):
+    """Pin proses ke satu core dan naikkan prioritas (jika didukung OS dan diizinkan)"""
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+            print(f"OK: Proses akuisisi di-pin ke CPU {cpu}")
+        except OSError as e:
+            print(f"WARNING: Gagal pin proses akuisisi ke CPU {cpu}: {e}")
+    if nice is not None and hasattr(os, 'setpriority'):
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, nice)
+            print(f"OK: Prioritas proses akuisisi: nice {nice}")
+        except OSError as e:
+            print(f"WARNING: Gagal menaikkan prioritas proses akuisisi (jalankan dengan sudo): {e}")
+
+
+def acquisition_worker(ring_name, capacity, conn, options):
+    """
+    Entry point child process: baca ADS1232, stabilizer, lalu kirim Reading ke ring buffer
+    Perintah dari parent lewat pipe: 'tare', 'offset_cal', 'stop'
+    """
+    # Ctrl+C ditangani parent, child berhenti lewat perintah 'stop'
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_acquisition_priority(options.get('cpu'), options.get('nice', ACQUISITION_NICE))
+    
+    app = TimbanganApp(shm_name=None, idle=options.get('idle', False),
+                       scale_interval=options.get('scale_interval', SCALE_INTERVAL),
+                       high_speed=options.get('high_speed', False),
+                       profile=options.get('profile', False),
+                       profile_interval=options.get('profile_interval', PROFILE_INTERVAL),
+                       profile_dir=PROFILE_ACQUISITION_DIR,
+                       stable_rearm_kg=options.get('stable_rearm_kg'))
+    ring = ReadingRing(ring_name, capacity)
+    parent_pid = os.getppid()
+    loop_delay = options.get('loop_delay', 0.05)
+    try:
+        while app.running:
+            if app.profiler is not None:
+                app.profiler.tick()
+            reading, stable = app.acquire_reading()
+            if reading is not None:
+                ring.push(reading)
+            if stable is not None:
+                ring.push(stable)
+            
+            while conn.poll():
+                command = conn.recv()
+                if command == 'tare':
+                    app.tare()
+                elif command == 'offset_cal':
+                    app.offset_scheduler.request()
+                elif command == 'stop':
+                    app.running = False
+            
+            # Parent mati tanpa sempat mengirim 'stop'
+            if os.getppid() != parent_pid:
+                break
+            time.sleep(app.loop_delay(loop_delay))
+    except (EOFError, BrokenPipeError):
+        pass  # Pipe ke parent tertutup
+    finally:
+        ring.close()
+        app.cleanup()
+
+
+class AcquisitionProcess:
+    """Sisi parent dari proses akuisisi: start child, baca ring buffer, kirim perintah"""
+    
+    def __init__(self, options):
+        ctx = multiprocessing.get_context('spawn')
+        self.ring = ReadingRing(create=True)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=acquisition_worker, name="timbangan-acquisition",
+                                   args=(self.ring.name, self.ring.capacity, child_conn, options),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+    
+    def poll(self):
+        """Ambil semua Reading baru dari child process"""
+        return self.ring.pop_all()
+    
+    def send(self, command):
+        """Kirim perintah ke child process"""
+        try:
+            self.conn.send(command)
+        except (BrokenPipeError, OSError):
+            pass
+    
+    def is_alive(self):
+        return self.process.is_alive()
+    
+    def stop(self, timeout=ACQUISITION_STOP_TIMEOUT):
+        """Hentikan child process dengan bersih, paksa jika tidak merespons"""
+        self.send('stop')
+        self.process.join(timeout)
+        if self.process.is_alive():
+            print("WARNING: Proses akuisisi tidak merespons, dihentikan paksa")
+            self.process.terminate()
+            self.process.join(1.0)
+        self.conn.close()
+        self.ring.close()
+
+
 class TimbanganApp:
     """Aplikasi utama timbangan dengan deteksi stabilitas"""
     
-    def __init__(self):
+    def __init__(self, shm_name=SHM_NAME, uplink_url=None, idle=False, profile=False,
+                 scale_interval=SCALE_INTERVAL, acquisition_options=None, checkweigher=None,
+                 control_port=None, high_speed=False, profile_interval=PROFILE_INTERVAL,
+                 profile_dir=PROFILE_DIR, stable_rearm_kg=None):
+        """
+        acquisition_options: dict opsi child process (cpu, nice, loop_delay);
+                             None = akuisisi di proses ini
+        high_speed: True = ADS1232 80 SPS, False = 10 SPS (mode idle kembali ke speed ini saat ada beban)
+        profile_interval: jeda antar capture profiling (detik) jika profile aktif
+        profile_dir: directory hasil profiling
+        checkweigher: instance Checkweigher, None = mode timbangan biasa
+        stable_rearm_kg: lihat WeightStabilizer (default dari checkweigher jika aktif)
+        control_port: port UDP control interface, None = nonaktif
+        """
         # #region agent log
         try:
             ensure_debug_log_directory()
@@ -585,41 +1824,297 @@ class TimbanganApp:
         except: pass
         # #endregion
         
-        self.ads = ADS1232()
+        self.scale_interval = scale_interval
+        self.display_decimals = scale_interval_decimals(scale_interval)
+        self.high_speed = high_speed
         self.running = True
-        self.stabilizer = WeightStabilizer(threshold_kg=0.005, stable_count=5)
-        self.last_saved_weight = None
+        if checkweigher is not None and stable_rearm_kg is None:
+            stable_rearm_kg = checkweigher.min_load_kg
+        
+        # Publikasi pembacaan ke shared memory (None = nonaktif)
+        # Dibuat sebelum hardware: instance kedua ditolak sebelum menyentuh ADC
+        self.shared_reading = None
+        if shm_name:
+            try:
+                self.shared_reading = SharedReadingWriter(shm_name)
+            except RuntimeError:
+                raise
+            except Exception as e:
+                print(f"WARNING: Shared memory tidak tersedia: {e}")
+        
+        self.acquisition = None
+        self.ads = None
+        self.stabilizer = None
+        self.offset_scheduler = None
+        self.idle_policy = None
+        if acquisition_options is not None:
+            # ADS1232 dan stabilizer berjalan di child process
+            options = dict(acquisition_options, idle=idle, scale_interval=scale_interval,
+                           high_speed=high_speed, profile=profile, profile_interval=profile_interval,
+                           stable_rearm_kg=stable_rearm_kg)
+            self.acquisition = AcquisitionProcess(options)
+            self.acquisition_failed = False
+        else:
+            self.ads = ADS1232(high_speed=high_speed, scale_interval=scale_interval)
+            self.stabilizer = WeightStabilizer(threshold_kg=0.005, stable_count=5,
+                                               scale_factor=self.ads.scale_factor,
+                                               rearm_kg=stable_rearm_kg)
+            self.offset_scheduler = OffsetCalibrationScheduler(self.ads)
+            self.idle_policy = IdlePolicy(self.ads) if idle else None
+        self.profiler = None
+        if profile:
+            self.profiler = LoopProfiler(output_dir=profile_dir, interval_s=profile_interval)
+            print(f"OK: Profiling aktif, hasil di {profile_dir} (interval {profile_interval:.0f} detik, SIGUSR1 untuk capture)")
+            if self.acquisition is not None:
+                # Loop akuisisi/stabilizer diprofile di child process, parent hanya drain + penyimpanan
+                print(f"   Proses akuisisi (PID {self.acquisition.process.pid}) diprofile terpisah di {PROFILE_ACQUISITION_DIR}")
+        self.last_saved = None  # Reading stabil terakhir yang tersimpan
         self.last_save_time = None
         self.save_count = 0
         self.read_count = 0
-        self.current_weight = 0.0
-        self.is_stable = False
+        self.last_reading = Reading(0, time.monotonic_ns())  # Reading terbaru untuk tampilan
+        self.timestamper = Timestamper()
+        self.clock_step_pending = False
+        self.trend_chart = None  # TrendChart dari GUI, menerima setiap Reading
+        self.checkweigher = checkweigher
+        
+        self.control = None
+        if control_port:
+            try:
+                self.control = ControlServer(control_port)
+                print(f"OK: Control interface di udp://{CONTROL_HOST}:{control_port}")
+            except OSError as e:
+                print(f"WARNING: Control interface tidak aktif: {e}")
+        
+        # Uplink store-and-forward ke collector (None = nonaktif)
+        self.uplink = None
+        if uplink_url:
+            try:
+                self.uplink = UplinkForwarder(uplink_url)
+                print(f"OK: Uplink aktif ke {uplink_url}")
+            except Exception as e:
+                print(f"WARNING: Uplink tidak aktif: {e}")
     
     def process_reading(self):
-        """Process one reading cycle (read, stabilize, save)"""
+        """
+        Process one reading cycle (read, stabilize, save)
+        Returns: Reading yang baru tersimpan, atau None
+        """
+        if self.profiler is not None:
+            self.profiler.tick()
+        if self.control is not None:
+            self.poll_control()
+        if self.acquisition is not None:
+            return self._drain_acquisition()
+        
+        reading, stable = self.acquire_reading()
+        if reading is None:
+            return None
+        saved = self.store_reading(reading, stable)
+        if self.trend_chart is not None:
+            self.trend_chart.add_reading(reading)
+            if stable is not None:
+                self.trend_chart.add_reading(stable)
+        return saved
+    
+    def acquire_reading(self):
+        """
+        Baca satu sampel dan jalankan stabilizer
+        Returns: (sampel, rata-rata stabil); sampel None jika gagal baca,
+                 rata-rata berupa Reading READING_AVERAGE terpisah atau None jika belum stabil
+        """
         self.read_count += 1
-        weight = self.ads.read_weight()
-        
-        if weight is not None:
-            self.current_weight = weight
-            # Cek apakah berat stabil
-            self.is_stable = self.stabilizer.add_reading(weight)
-            
-            # Simpan HANYA jika berat stabil dan berbeda dari sebelumnya
-            if self.is_stable:
-                stable_weight = self.stabilizer.get_stable_weight()
-                if stable_weight is not None:
-                    now = datetime.now()
-                    timestamp_ms = now.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                    
-                    # Simpan ke file
-                    if self.save_to_file(stable_weight, timestamp_ms):
-                        self.last_saved_weight = stable_weight
-                        return stable_weight, timestamp_ms
-        return None, None
+        if self.idle_policy is not None:
+            self.idle_policy.before_read()
+        # Offset calibration on-chip (periodik / on-demand) sebelum sampel berikutnya
+        self.offset_scheduler.tick()
+        counts = self.ads.read_counts()
+        reading = None
+        if counts is not None:
+            # Konversi ke kg hanya di output (tampilan / idle policy / shared memory)
+            reading = Reading(counts, time.monotonic_ns(), self.ads.counts_to_kg(counts))
+        if self.idle_policy is not None:
+            self.idle_policy.after_read(None if reading is None else reading.weight)
+        
+        if reading is None:
+            return None, None
+        
+        # Threshold stabilizer dikonversi ulang ke count hanya jika kalibrasi berubah
+        if self.stabilizer.scale_factor != self.ads.scale_factor:
+            self.stabilizer.set_scale_factor(self.ads.scale_factor)
+        
+        self.last_reading = reading
+        # Cek apakah berat stabil (flag READING_STABLE di-set oleh stabilizer)
+        self.stabilizer.add_reading(reading)
+        
+        stable = None
+        if reading.is_stable:
+            stable_counts = self.stabilizer.get_stable_weight()
+            if stable_counts is not None:
+                # Sampel tetap apa adanya, rata-rata buffer stabil dibawa Reading terpisah
+                stable = Reading(stable_counts, reading.t_ns, self.ads.counts_to_kg(stable_counts),
+                                 READING_STABLE | READING_AVERAGE)
+        return reading, stable
+    
+    def store_reading(self, reading, stable=None):
+        """
+        Cek waktu sistem, simpan rata-rata stabil (jika ada) dan publikasikan sampel ke shared memory
+        Returns: Reading stabil jika tersimpan, atau None
+        """
+        if self.timestamper.check_clock(reading.t_ns):
+            # Ditandai pada data tersimpan berikutnya agar urutan data bisa diverifikasi
+            self.clock_step_pending = True
+            print(f"\nWARNING: Waktu sistem melompat {self.timestamper.last_step_ns / 1e9:+.3f} detik")
+        
+        saved = None
+        if stable is not None:
+            saved = self.save_stable(stable)
+        self.publish_reading()
+        return saved
+    
+    def save_stable(self, reading):
+        """
+        Simpan Reading rata-rata stabil (checkweigher, file, uplink)
+        Returns: Reading jika tersimpan, atau None
+        """
+        # Simpan HANYA jika berat stabil dan berbeda dari sebelumnya
+        if reading.is_stable:
+            reading.timestamp = self.timestamper.format(reading.t_ns)
+            if self.clock_step_pending:
+                reading.flags |= READING_CLOCK_STEP
+            
+            # Keputusan checkweigher dikirim sebelum I/O file
+            if self.checkweigher is not None and self.checkweigher.classify(reading) is not None:
+                if self.control is not None:
+                    self.control.notify(f"DECISION {self.checkweigher.active.code} "
+                                        f"{self.format_weight(reading.weight)} {decision_name(reading.flags)} "
+                                        f"{reading.timestamp}")
+            
+            # Simpan ke file
+            if self.save_to_file(reading):
+                reading.flags |= READING_SAVED
+                self.clock_step_pending = False
+                self.last_saved = reading
+                if self.uplink is not None:
+                    self.uplink.enqueue(reading)
+                return reading
+        return None
+    
+    def _drain_acquisition(self):
+        """Proses semua Reading dari child process; return Reading terakhir yang tersimpan"""
+        saved = None
+        for reading in self.acquisition.poll():
+            if reading.flags & READING_AVERAGE:
+                # Rata-rata stabil selalu menyusul sampelnya di ring buffer
+                stored = self.save_stable(reading)
+                self.publish_reading()
+            else:
+                self.read_count += 1
+                self.last_reading = reading
+                stored = self.store_reading(reading)
+            if stored is not None:
+                saved = stored
+            if self.trend_chart is not None:
+                self.trend_chart.add_reading(reading)
+        
+        if not self.acquisition.is_alive() and not self.acquisition_failed:
+            self.acquisition_failed = True
+            self.running = False
+            print("\nERROR: Proses akuisisi berhenti")
+        return saved
+    
+    def poll_control(self):
+        """Proses perintah dari control interface"""
+        for text, addr in self.control.poll():
+            self.control.reply(addr, self.handle_command(text, addr))
     
-    def save_to_file(self, weight, timestamp):
-        """Simpan data ke file (replace, tidak append) dengan timestamp real-time"""
+    def handle_command(self, text, addr=None):
+        """Jalankan satu perintah teks; return balasan"""
+        parts = text.split()
+        if not parts:
+            return "ERROR perintah kosong"
+        command = parts[0].lower()
+        if command == 'tare':
+            self.tare()
+            return "OK tare"
+        if command == 'offset_cal':
+            if self.acquisition is not None:
+                self.acquisition.send('offset_cal')
+            else:
+                self.offset_scheduler.request()
+            return "OK offset_cal"
+        if command == 'sku':
+            if self.checkweigher is None:
+                return "ERROR checkweigher tidak aktif"
+            if len(parts) == 1:
+                active = self.checkweigher.active
+                return f"SKU {active.code if active else '-'}"
+            if not self.checkweigher.select(parts[1]):
+                return f"ERROR SKU {parts[1]} tidak ada"
+            return f"OK SKU {parts[1]}"
+        if command == 'stats':
+            if self.checkweigher is None:
+                return "ERROR checkweigher tidak aktif"
+            return "\n".join(self.checkweigher.stats_lines()) or "Belum ada data"
+        if command == 'subscribe' and addr is not None:
+            self.control.subscribers.add(addr)
+            return "OK subscribe"
+        if command == 'unsubscribe' and addr is not None:
+            self.control.subscribers.discard(addr)
+            return "OK unsubscribe"
+        return f"ERROR perintah tidak dikenal: {parts[0]}"
+    
+    def tare(self):
+        """Tare / zero (di child process jika akuisisi terpisah)"""
+        if self.trend_chart is not None:
+            self.trend_chart.mark_tare()
+        if self.acquisition is not None:
+            self.acquisition.send('tare')
+        else:
+            self.ads.tare()
+            self.ads.save_calibration()
+    
+    def format_weight(self, weight_kg):
+        """Format berat sesuai resolusi scale interval d"""
+        return f"{weight_kg:.{self.display_decimals}f}"
+    
+    def loop_delay(self, active_delay):
+        """Jeda antar siklus pembacaan, lebih pendek pada 80 SPS dan lebih panjang saat idle"""
+        if self.high_speed and self.ads is not None:
+            active_delay = min(active_delay, HIGH_SPEED_LOOP_DELAY)
+        if self.idle_policy is not None:
+            return self.idle_policy.loop_delay(active_delay)
+        return active_delay
+    
+    def publish_reading(self):
+        """Update segment shared memory dengan pembacaan terbaru"""
+        if self.shared_reading is not None:
+            self.shared_reading.publish(self.last_reading, self.last_saved, self.last_save_time,
+                                        self.timestamper.wall_time(self.last_reading.t_ns))
+    
+    def cleanup(self):
+        """Bersihkan hardware, shared memory, uplink dan profiler"""
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+        if self.uplink is not None:
+            self.uplink.close()
+            self.uplink = None
+        if self.shared_reading is not None:
+            self.shared_reading.close()
+            self.shared_reading = None
+        if self.control is not None:
+            self.control.close()
+            self.control = None
+        if self.acquisition is not None:
+            self.acquisition.stop()
+        if self.ads is not None:
+            self.ads.cleanup()
+    
+    def save_to_file(self, reading):
+        """Simpan Reading ke file (replace, tidak append) dengan timestamp real-time"""
+        weight = reading.weight
+        timestamp = reading.timestamp
         # #region agent log
         try:
             f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:600','message':'save_to_file called','data':{'weight':weight,'timestamp':timestamp,'save_count':self.save_count},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H1'})+'\n');f.close()
@@ -635,13 +2130,18 @@ class TimbanganApp:
             # Tulis data ke file
             with open(DATA_FILE, 'w', encoding='utf-8') as f:
                 f.write(f"Waktu: {timestamp}\n")
-                f.write(f"Tanggal: {timestamp.split()[0]}\n")
-                f.write(f"Jam: {timestamp.split()[1]}\n")
-                f.write(f"Berat: {weight:.3f} kg\n")
+                f.write(f"Tanggal: {timestamp[:10]}\n")
+                f.write(f"Jam: {timestamp[11:]}\n")
+                f.write(f"Berat: {self.format_weight(weight)} kg\n")
                 f.write(f"Timestamp: {timestamp}\n")
+                if reading.flags & READING_DECISION_MASK:
+                    f.write(f"SKU: {self.checkweigher.active.code}\n")
+                    f.write(f"Keputusan: {decision_name(reading.flags)}\n")
+                if reading.flags & READING_CLOCK_STEP:
+                    f.write("Peringatan: Waktu sistem melompat sejak data sebelumnya\n")
             
             self.save_count += 1
-            self.last_save_time = time.time()
+            self.last_save_time = self.timestamper.wall_time(reading.t_ns)
             
             # #region agent log
             try:
@@ -660,11 +2160,11 @@ class TimbanganApp:
             print(f"Error menyimpan data: {e}")
             return False
     
-    def display_weight(self, weight, is_stable=False):
+    def display_weight(self, reading):
         """Tampilkan berat di console dengan indikator stabilitas"""
-        if weight is not None:
-            status = "STABIL" if is_stable else "      "
-            print(f"\rBerat: {weight:8.3f} kg  [{status}]  ", end='', flush=True)
+        if reading is not None:
+            status = "STABIL" if reading.is_stable else "      "
+            print(f"\rBerat: {self.format_weight(reading.weight):>8} kg  [{status}]  ", end='', flush=True)
         else:
             print(f"\rBerat: ERROR                    ", end='', flush=True)
     
@@ -677,6 +2177,7 @@ class TimbanganApp:
         print()
         print("ℹ️  Data akan disimpan hanya ketika berat stabil")
         print("ℹ️  Threshold stabilitas: ±5 gram")
+        print(f"ℹ️  Scale interval (d): {self.scale_interval * 1000:g} gram")
         print()
         
         # #region agent log
@@ -687,25 +2188,28 @@ class TimbanganApp:
         
         try:
             while self.running:
-                saved_weight, save_time = self.process_reading()
+                saved = self.process_reading()
                 
                 # #region agent log
                 if self.read_count % 10 == 0:
                     try:
-                        f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:680','message':'Weight read (every 10th)','data':{'weight':self.current_weight,'read_count':self.read_count,'save_count':self.save_count},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H1'})+'\n');f.close()
+                        f=open(DEBUG_LOG_FILE,'a',encoding='utf-8');f.write(json.dumps({'location':'timbangan.py:680','message':'Weight read (every 10th)','data':{'weight':self.last_reading.weight,'read_count':self.read_count,'save_count':self.save_count},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'H1'})+'\n');f.close()
                     except: pass
                 # #endregion
                 
                 # Tampilkan di console
-                self.display_weight(self.current_weight, self.is_stable)
+                self.display_weight(self.last_reading)
                 
-                if saved_weight is not None:
+                if saved is not None:
                      # Tampilkan notifikasi singkat
-                    print(f"\n💾 Tersimpan: {saved_weight:.3f} kg pada {save_time}")
+                    print(f"\n💾 Tersimpan: {self.format_weight(saved.weight)} kg pada {saved.timestamp}")
+                    decision = decision_name(saved.flags)
+                    if decision is not None:
+                        print(f"   Checkweigher: {decision} (SKU {self.checkweigher.active.code})")
                     print(f"   Total pembacaan: {self.read_count}, Total simpan: {self.save_count}")
                     print()
                 
-                time.sleep(0.1)  # Update setiap 100ms
+                time.sleep(self.loop_delay(0.1))  # Update setiap 100ms (lebih jarang saat idle)
         
         except KeyboardInterrupt:
             print("\n\nProgram dihentikan oleh user")
@@ -715,6 +2219,9 @@ class TimbanganApp:
             if self.read_count > 0:
                 efficiency = (1 - self.save_count / self.read_count) * 100
                 print(f"  Efisiensi: {efficiency:.1f}% (pengurangan operasi file)")
+            if self.checkweigher is not None:
+                for line in self.checkweigher.stats_lines():
+                    print(f"  {line}")
         except Exception as e:
             print(f"\n\nError: {e}")
         finally:
@@ -724,16 +2231,175 @@ class TimbanganApp:
             except: pass
             # #endregion
             
-            self.ads.cleanup()
+            self.cleanup()
             print("Program selesai")
 
 
+class TrendChart:
+    """
+    Strip chart berat vs waktu di Tk Canvas
+    Sampel dikelompokkan per kolom pixel (first/min/max/last), sehingga biaya gambar
+    tidak bergantung sample rate. Canvas hanya digeser dan kolom baru ditambahkan;
+    gambar ulang penuh hanya saat skala Y berubah
+    """
+    
+    MARK_SAVED = 0x01
+    MARK_TARE = 0x02
+    
+    def __init__(self, parent, width=TREND_WIDTH, height=TREND_HEIGHT, window_s=TREND_WINDOW, decimals=3):
+        self.width = width
+        self.height = height
+        self.decimals = decimals
+        self.ns_per_px = max(1, int(window_s * 1e9 / width))
+        # Pada 10 SPS sampel berjarak beberapa kolom; kolom disambung selama jaraknya bukan jeda data
+        self.max_gap_cols = max(1, int(TREND_MAX_GAP * 1e9 / self.ns_per_px))
+        self.canvas = tk.Canvas(parent, width=width, height=height, bg="white",
+                                highlightthickness=1, highlightbackground="#ccc")
+        
+        self.pending = deque(maxlen=TREND_PENDING_MAX)  # Diisi thread pembaca
+        self.pending_tares = deque()
+        self.columns = deque()  # [col, first, low, high, last, marks] yang sudah tergambar
+        self.open_column = None  # Kolom terbaru yang masih menerima sampel
+        self.right_col = None  # Index kolom di tepi kanan canvas
+        self.y_min = -TREND_MIN_SPAN / 2
+        self.y_max = TREND_MIN_SPAN / 2
+        self.next_fit_check = time.monotonic() + TREND_FIT_INTERVAL
+        self._draw_axes()
+    
+    def add_reading(self, reading):
+        """Tambahkan Reading (dipanggil dari thread pembaca)"""
+        self.pending.append(reading)
+    
+    def mark_tare(self, t_ns=None):
+        """Tandai waktu tare di chart"""
+        self.pending_tares.append(time.monotonic_ns() if t_ns is None else t_ns)
+    
+    def update(self):
+        """Gambar kolom yang sudah lengkap (dipanggil dari Tk main thread)"""
+        finished = []
+        column = self.open_column
+        while self.pending:
+            reading = self.pending.popleft()
+            if reading.flags & READING_AVERAGE:
+                # Rata-rata stabil bukan titik data, hanya menandai kolom sampelnya
+                if column is not None and reading.flags & READING_SAVED:
+                    column[5] |= self.MARK_SAVED
+                continue
+            weight = reading.weight
+            col = reading.t_ns // self.ns_per_px
+            if column is not None and col > column[0]:
+                finished.append(column)
+                column = None
+            if column is None:
+                column = [col, weight, weight, weight, weight, 0]
+            else:
+                column[2] = min(column[2], weight)
+                column[3] = max(column[3], weight)
+                column[4] = weight
+        self.open_column = column
+        
+        for column in finished:
+            while self.pending_tares and self.pending_tares[0] // self.ns_per_px <= column[0]:
+                self.pending_tares.popleft()
+                column[5] |= self.MARK_TARE
+        
+        if finished:
+            self._append_columns(finished)
+    
+    def _append_columns(self, finished):
+        new_right = finished[-1][0]
+        if self.right_col is None or new_right - self.right_col >= self.width:
+            # Awal atau jeda panjang (misal idle): mulai dari kosong
+            self.columns.clear()
+            self.canvas.delete("data")
+        else:
+            self.canvas.move("data", self.right_col - new_right, 0)
+        self.right_col = new_right
+        
+        left_col = new_right - self.width
+        while self.columns and self.columns[0][0] <= left_col:
+            self.canvas.delete(f"c{self.columns.popleft()[0]}")
+        finished = [column for column in finished if column[0] > left_col]
+        
+        prev = self.columns[-1] if self.columns else None
+        self.columns.extend(finished)
+        
+        if self._rescale_needed(finished):
+            self._redraw()
+            return
+        for column in finished:
+            self._draw_column(column, prev)
+            prev = column
+    
+    def _rescale_needed(self, finished):
+        """Perlebar skala jika data keluar batas, persempit berkala jika data terlalu kecil"""
+        low = min(column[2] for column in finished)
+        high = max(column[3] for column in finished)
+        if low < self.y_min or high > self.y_max:
+            self._fit()
+            return True
+        now = time.monotonic()
+        if now >= self.next_fit_check:
+            self.next_fit_check = now + TREND_FIT_INTERVAL
+            low = min(0.0, min(column[2] for column in self.columns))
+            high = max(0.0, max(column[3] for column in self.columns))
+            if max(high - low, TREND_MIN_SPAN) < (self.y_max - self.y_min) / 4:
+                self._fit()
+                return True
+        return False
+    
+    def _fit(self):
+        low = min(0.0, min(column[2] for column in self.columns))
+        high = max(0.0, max(column[3] for column in self.columns))
+        span = max(high - low, TREND_MIN_SPAN)
+        self.y_min = low - span * 0.1
+        self.y_max = high + span * 0.1
+    
+    def _y(self, weight):
+        return 4 + (self.y_max - weight) / (self.y_max - self.y_min) * (self.height - 8)
+    
+    def _draw_axes(self):
+        self.canvas.delete("axis")
+        if self.y_min <= 0.0 <= self.y_max:
+            y0 = self._y(0.0)
+            self.canvas.create_line(0, y0, self.width, y0, fill="#ddd", tags="axis")
+        self.canvas.create_text(3, 3, anchor="nw", text=f"{self.y_max:.{self.decimals}f} kg",
+                                fill="#999", font=("Helvetica", 8), tags="axis")
+        self.canvas.create_text(3, self.height - 3, anchor="sw", text=f"{self.y_min:.{self.decimals}f} kg",
+                                fill="#999", font=("Helvetica", 8), tags="axis")
+        self.canvas.tag_lower("axis")
+    
+    def _redraw(self):
+        self.canvas.delete("data")
+        self._draw_axes()
+        prev = None
+        for column in self.columns:
+            self._draw_column(column, prev)
+            prev = column
+    
+    def _draw_column(self, column, prev):
+        col, first, low, high, last, marks = column
+        x = self.width - 1 - (self.right_col - col)
+        tags = ("data", f"c{col}")
+        if prev is not None and col - prev[0] <= self.max_gap_cols:
+            self.canvas.create_line(x - (col - prev[0]), self._y(prev[4]), x, self._y(first),
+                                    fill="#337ab7", tags=tags)
+        self.canvas.create_line(x, self._y(high), x, self._y(low) + 1, fill="#337ab7", tags=tags)
+        if marks & self.MARK_SAVED:
+            y = self._y(last)
+            self.canvas.create_oval(x - 3, y - 3, x + 3, y + 3, fill="green", outline="green", tags=tags)
+        if marks & self.MARK_TARE:
+            self.canvas.create_line(x, 0, x, self.height, fill="#d9534f", dash=(3, 2), tags=tags)
+            self.canvas.create_text(x + 2, self.height - 3, anchor="sw", text="T", fill="#d9534f",
+                                    font=("Helvetica", 8, "bold"), tags=tags)
+
+
 class TimbanganGUI:
     def __init__(self, app):
         self.app = app
         self.root = tk.Tk()
         self.root.title("Aplikasi Timbangan Digital")
-        self.root.geometry("600x400")
+        self.root.geometry("600x580")
         self.root.configure(bg="#f0f0f0")
         
         # Handle close event
@@ -774,6 +2440,11 @@ class TimbanganGUI:
         save_label = tk.Label(main_frame, textvariable=self.save_info_var, font=("Helvetica", 10), bg="#f0f0f0", fg="#666")
         save_label.pack(pady=5)
         
+        # Trend chart berat vs waktu
+        self.trend_chart = TrendChart(main_frame, decimals=self.app.display_decimals)
+        self.trend_chart.canvas.pack(pady=5)
+        self.app.trend_chart = self.trend_chart
+        
         # Buttons Frame
         btn_frame = tk.Frame(main_frame, bg="#f0f0f0")
         btn_frame.pack(pady=20, fill="x")
@@ -792,30 +2463,30 @@ class TimbanganGUI:
         
     def _tare_thread(self):
         self.status_var.set("Melakukan Tare...")
-        self.app.ads.tare()
-        self.app.ads.save_calibration()
+        self.app.tare()
     
     def read_loop(self):
         """Thread untuk membaca sensor data terus menerus"""
         while self.app.running:
-            saved_weight, save_time = self.app.process_reading()
-            if saved_weight is not None:
-                self.save_info_var.set(f"Tersimpan: {saved_weight:.3f} kg @ {save_time.split()[1]}")
-            time.sleep(0.05)  # Sedikit lebih cepat dari CLI
+            saved = self.app.process_reading()
+            if saved is not None:
+                decision = decision_name(saved.flags)
+                suffix = f"  [{decision}]" if decision is not None else ""
+                self.save_info_var.set(f"Tersimpan: {self.app.format_weight(saved.weight)} kg @ {saved.timestamp[11:]}{suffix}")
+            time.sleep(self.app.loop_delay(0.05))  # Sedikit lebih cepat dari CLI
             
     def update_ui(self):
         """Update UI dari main thread"""
         if not self.app.running:
             return
             
-        weight = self.app.current_weight
-        is_stable = self.app.is_stable
+        reading = self.app.last_reading
         
         # Update text berat
-        self.weight_var.set(f"{weight:.3f} kg")
+        self.weight_var.set(f"{self.app.format_weight(reading.weight)} kg")
         
         # Update status indikator
-        if is_stable:
+        if reading.is_stable:
             self.status_var.set("STABIL")
             self.status_label.config(fg="green")
             self.weight_label.config(fg="green")
@@ -823,6 +2494,9 @@ class TimbanganGUI:
             self.status_var.set("Tidak Stabil")
             self.status_label.config(fg="#ffc107") # Amber/Orange
             self.weight_label.config(fg="black")
+        
+        # Gambar sampel baru di trend chart
+        self.trend_chart.update()
             
         # Schedule next update (50ms)
         self.root.after(50, self.update_ui)
@@ -830,10 +2504,19 @@ class TimbanganGUI:
     def on_closing(self):
         self.app.running = False
         self.root.destroy()
-        self.app.ads.cleanup()
+        self.app.cleanup()
         sys.exit(0)
 
 
+def get_arg_value(name, default=None):
+    """Ambil nilai argument command line, misal: --uplink http://host/path"""
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
 def main():
     """Fungsi utama"""
     try:
@@ -882,7 +2565,41 @@ def main():
                 print("✅ Konfigurasi pin aman dan valid")
             print()
         
-        app = TimbanganApp()
+        # Opsi akuisisi di child process terpisah (--process [--cpu N] [--nice N])
+        acquisition_options = None
+        if "--process" in sys.argv:
+            cpu = get_arg_value("--cpu")
+            nice = get_arg_value("--nice")
+            acquisition_options = {
+                'cpu': None if cpu is None else int(cpu),
+                'nice': ACQUISITION_NICE if nice is None else int(nice),
+                'loop_delay': 0.05 if "--gui" in sys.argv else 0.1,
+            }
+        
+        scale_interval = float(get_arg_value("--scale-interval", SCALE_INTERVAL))
+        
+        # Mode checkweigher (--checkweigher [--sku-file PATH] [--sku KODE])
+        checkweigher = None
+        if "--checkweigher" in sys.argv:
+            sku_file = get_arg_value("--sku-file", SKU_FILE)
+            try:
+                checkweigher = Checkweigher.load(sku_file, scale_interval)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"ERROR: Gagal memuat tabel SKU {sku_file}: {e}")
+                return
+            sku = get_arg_value("--sku")
+            if sku is not None and not checkweigher.select(sku):
+                print(f"WARNING: SKU {sku} tidak ada di tabel")
+        
+        control_port = get_arg_value("--control-port")
+        app = TimbanganApp(uplink_url=get_arg_value("--uplink"), idle="--idle" in sys.argv,
+                           profile="--profile" in sys.argv,
+                           profile_interval=float(get_arg_value("--profile-interval", PROFILE_INTERVAL)),
+                           scale_interval=scale_interval,
+                           acquisition_options=acquisition_options,
+                           checkweigher=checkweigher,
+                           control_port=None if control_port is None else int(control_port),
+                           high_speed="--80sps" in sys.argv)
         
         # Cek argument --gui
         if "--gui" in sys.argv: